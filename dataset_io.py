@@ -0,0 +1,60 @@
+"""
+Dataset I/O helpers shared by the retail data generators and the H2O model pipeline
+"""
+
+import os
+import tempfile
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+def write_csv(df, path):
+    """Write a DataFrame to CSV with Arrow's multi-threaded C++ writer"""
+    # Date-only columns (every value at midnight) are written as YYYY-MM-DD;
+    # columns with a time of day keep their full timestamp
+    date_only = {
+        name for name in df.select_dtypes(include='datetime').columns
+        if df[name].dt.normalize().equals(df[name])
+    }
+    
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if field.name in date_only and pa.types.is_timestamp(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.date32()))
+    
+    pacsv.write_csv(table, path, write_options=pacsv.WriteOptions(batch_size=16384))
+
+def upload_parquet(chunks, destination_frame=None):
+    """Write DataFrame chunks to one temporary Parquet file and upload it to H2O as a single frame"""
+    import h2o
+    
+    with tempfile.TemporaryDirectory(prefix='retail_parquet_') as tmp_dir:
+        path = os.path.join(tmp_dir, 'retail.parquet')
+        writer = None
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    # Snappy and millisecond timestamps are supported by H2O's bundled Parquet reader
+                    writer = pq.ParquetWriter(path, schema, compression='snappy',
+                                              coerce_timestamps='ms', allow_truncated_timestamps=True)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            raise ValueError("upload_parquet needs at least one chunk")
+        # The cluster can't see the client's temp dir, so send the file rather than import_file it
+        return h2o.upload_file(path, destination_frame=destination_frame)
+
+def time_split(df, q=0.8):
+    """Split df by time into (train, test); train holds dates <= the lower q-quantile date"""
+    by_date = df.sort_values('date', kind='stable').reset_index(drop=True)
+    if len(by_date) == 0:
+        return by_date, by_date.copy()
+    
+    dates = by_date['date']
+    # Once sorted, the quantile is a positional lookup and the cut a binary search
+    split_date = dates.iloc[int(q * (len(dates) - 1))]
+    split_idx = dates.searchsorted(split_date, side='right')
+    return by_date.iloc[:split_idx], by_date.iloc[split_idx:]
@@ -4,17 +4,40 @@ Using h2o.create_frame() for specialized retail/time-series data
 """
 
 import h2o
-from h2o import H2OFrame
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import warnings
-warnings.filterwarnings('ignore')
+from dataset_io import time_split, upload_parquet, write_csv
+
+# Optional JIT for the demand kernel; falls back to plain NumPy
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+    NUMBA_ENGINE_KWARGS = {'nopython': True, 'nogil': True, 'parallel': True}
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+# Optional C moving-window kernels for the rolling features
+try:
+    import bottleneck as bn
+    BOTTLENECK_AVAILABLE = True
+except ImportError:
+    BOTTLENECK_AVAILABLE = False
+
+# Columns downcast only after the rolling revenue sum, which accumulates in float64
+COMPACT_DTYPES = {
+    'price': np.float32,
+    'revenue': np.float32
+}
 
 def initialize_h2o():
     """Initialize H2O cluster"""
     try:
-        h2o.init(ip="localhost", port=54321, max_mem_size="4g")
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            h2o.init(ip="localhost", port=54321, max_mem_size="4g")
         print("✅ Connected to H2O cluster")
         return True
     except Exception as e:
@@ -22,30 +45,27 @@ def initialize_h2o():
         print(f"Error: {e}")
         return False
 
-def create_retail_base_frame():
-    """Create base retail data using H2O's native create_frame function"""
-    print("🏪 Creating base retail frame with H2O...")
-    
-    # Create synthetic product data (100 products)
-    products_frame = h2o.create_frame(
-        rows=100,
-        cols=6,
-        randomize=True,
-        categorical_fraction=0.5,  # Product categories, suppliers
-        real_fraction=0.3,         # Base prices, weights
-        integer_fraction=0.2,      # SKU numbers, shelf life
-        factors=20,                # Different categories/suppliers
-        real_range=500,            # Price range 0-500
-        integer_range=365,         # Shelf life up to 1 year
-        missing_fraction=0.0,      # No missing values for products
-        seed=42
-    )
-    
-    # Rename columns for clarity
-    products_frame.columns = ['product_id', 'category', 'supplier', 'base_price', 'weight', 'shelf_life_days']
+def create_retail_base_frame(n_products=100, seed=42):
+    """Create base retail product data in pandas (uploaded to H2O with the final frame)"""
+    print("🏪 Creating base retail frame...")
+    
+    rng = np.random.default_rng(seed)
+    
+    # Create synthetic product data (100 products, 20 categories/suppliers)
+    # Labels are formatted once and referenced by code, never per row
+    categories = [f"CAT_{i:02d}" for i in range(20)]
+    suppliers = [f"SUP_{i:02d}" for i in range(20)]
+    products_df = pd.DataFrame({
+        'product_id': np.arange(n_products),
+        'category': pd.Categorical.from_codes(rng.integers(0, 20, n_products), categories=categories),
+        'supplier': pd.Categorical.from_codes(rng.integers(0, 20, n_products), categories=suppliers),
+        'base_price': rng.uniform(1, 500, n_products),          # Price range 1-500
+        'weight': rng.uniform(0.1, 50, n_products),
+        'shelf_life_days': rng.integers(1, 366, n_products)     # Shelf life up to 1 year
+    })
     
-    print(f"✅ Created {products_frame.nrows} products with {products_frame.ncols} attributes")
-    return products_frame
+    print(f"✅ Created {len(products_df)} products with {products_df.shape[1]} attributes")
+    return products_df
 
 def create_time_series_features():
     """Create time-based features for 2 years of data"""
@@ -54,52 +74,112 @@ def create_time_series_features():
     # Generate 730 days (2 years) of date data
     dates = pd.date_range(start='2022-01-01', periods=730, freq='D')
     
+    # Derive every calendar field arithmetically from one datetime64 array instead of
+    # a separate dt accessor pass per column
+    days = dates.to_numpy(dtype='datetime64[D]')
+    year_start = days.astype('datetime64[Y]')
+    year = (year_start.astype(np.int64) + 1970).astype(np.int16)
+    month = (days.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+    day_of_year = ((days - year_start).astype(np.int64) + 1).astype(np.int16)
+    # Daily frequency: weekday advances by one per row
+    day_of_week = ((np.arange(len(days)) + dates[0].weekday()) % 7).astype(np.int8)
+    
     # Create time features
     time_data = pd.DataFrame({
         'date': dates,
-        'year': dates.year,
-        'month': dates.month,
-        'day_of_week': dates.dayofweek,
-        'quarter': dates.quarter,
-        'week_of_year': dates.isocalendar().week,
-        'is_weekend': (dates.dayofweek >= 5).astype(int),
-        'is_holiday_season': dates.month.isin([11, 12]).astype(int),
-        'day_of_year': dates.dayofyear
+        'year': year,
+        'month': month,
+        'day_of_week': day_of_week,
+        'quarter': (month - 1) // 3 + 1,
+        'week_of_year': (day_of_year - 1) // 7 + 1,  # Simple week number; not used downstream
+        'is_weekend': (day_of_week >= 5).astype(np.int8),
+        'is_holiday_season': (month >= 11).astype(np.int8),  # Nov + Dec
+        'day_of_year': day_of_year
     })
     
-    # Convert to H2O Frame
-    time_frame = H2OFrame(time_data)
-    print(f"✅ Created {time_frame.nrows} days of time features")
-    return time_frame
+    print(f"✅ Created {len(time_data)} days of time features")
+    return time_data
 
-def create_sales_patterns_frame():
-    """Create realistic sales patterns using H2O"""
-    print("📊 Creating sales pattern data...")
-    
-    # Create sales patterns for each product-date combination
-    # This would be 100 products * 730 days = 73,000 records
-    sales_frame = h2o.create_frame(
-        rows=73000,  # 100 products * 730 days
-        cols=8,
-        randomize=True,
-        real_fraction=0.6,     # Sales metrics, prices
-        integer_fraction=0.3,   # Quantities, stock levels
-        binary_fraction=0.1,    # Promotion flags
-        real_range=100,         # Sales quantities 0-100
-        integer_range=500,      # Stock levels 0-500
-        binary_ones_fraction=0.1,  # 10% promotion rate
-        missing_fraction=0.0,   # Complete data
-        seed=123
-    )
-    
-    # Rename columns meaningfully
-    sales_frame.columns = [
-        'base_demand', 'seasonal_factor', 'promotion_impact', 'weather_factor',
-        'quantity_sold', 'stock_level', 'reorder_quantity', 'on_promotion'
-    ]
-    
-    print(f"✅ Created {sales_frame.nrows} sales records")
-    return sales_frame
+def _demand_kernel(base_price, day_of_year, is_weekend, is_holiday_season,
+                   base_demand, weekend_roll, promo_roll, noise, price_jitter):
+    """Fused demand/pricing loop over the flattened product x day grid"""
+    n_days = day_of_year.shape[0]
+    n_rows = base_price.shape[0] * n_days
+    demand = np.empty(n_rows, dtype=np.int64)
+    price = np.empty(n_rows, dtype=np.float64)
+    on_promotion = np.empty(n_rows, dtype=np.bool_)
+    
+    for i in prange(n_rows):
+        product = i // n_days
+        day = i % n_days
+        
+        # Seasonal, weekend, holiday and promotion effects
+        multiplier = 1 + 0.3 * np.sin(2 * np.pi * day_of_year[day] / 365)
+        if is_weekend[day] and weekend_roll[i] < 0.5:
+            multiplier *= 1.3
+        if is_holiday_season[day]:
+            multiplier *= 2.0
+        promo = promo_roll[i] < 0.1
+        if promo:
+            multiplier *= 1.5
+        
+        demand[i] = max(0, int(base_demand[i] * multiplier * noise[i]))
+        price[i] = base_price[product] * (0.8 if promo else 1.0) * price_jitter[i]
+        on_promotion[i] = promo
+    
+    return demand, price, on_promotion
+
+def _vectorized_demand(base_price, day_of_year, is_weekend, is_holiday_season,
+                       base_demand, weekend_roll, promo_roll, noise, price_jitter):
+    """NumPy fallback for _demand_kernel when numba is not installed"""
+    n_products, n_days = base_price.shape[0], day_of_year.shape[0]
+    prod_idx = np.repeat(np.arange(n_products), n_days)
+    day_idx = np.tile(np.arange(n_days), n_products)
+    
+    seasonal_multiplier = 1 + 0.3 * np.sin(2 * np.pi * day_of_year[day_idx] / 365)
+    weekend_effect = np.where(is_weekend[day_idx] & (weekend_roll < 0.5), 1.3, 1.0)
+    holiday_effect = np.where(is_holiday_season[day_idx], 2.0, 1.0)
+    on_promotion = promo_roll < 0.1
+    promotion_effect = np.where(on_promotion, 1.5, 1.0)
+    
+    demand = np.maximum(0, (
+        base_demand * seasonal_multiplier * weekend_effect *
+        holiday_effect * promotion_effect * noise
+    ).astype(np.int64))
+    price = base_price[prod_idx] * np.where(on_promotion, 0.8, 1.0) * price_jitter
+    
+    return demand, price, on_promotion
+
+if NUMBA_AVAILABLE:
+    # Eager signature: compiled once at import, no JIT latency on first call
+    generate_demand = njit(
+        'Tuple((i8[:], f8[:], b1[:]))(f8[:], i8[:], b1[:], b1[:], f8[:], f8[:], f8[:], f8[:], f8[:])',
+        parallel=True, fastmath=True
+    )(_demand_kernel)
+else:
+    generate_demand = _vectorized_demand
+
+def cross_join(left, right):
+    """Cartesian product of two frames (left-major), built column-wise with np.repeat/np.tile"""
+    n_left, n_right = len(left), len(right)
+    
+    def expand(column, spread):
+        # Categoricals are expanded by code so labels are shared, not copied per row
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return pd.Categorical.from_codes(spread(column.cat.codes.to_numpy()), dtype=column.dtype)
+        return spread(column.to_numpy())
+    
+    columns = {col: expand(left[col], lambda v: np.repeat(v, n_right)) for col in left.columns}
+    columns.update({col: expand(right[col], lambda v: np.tile(v, n_left)) for col in right.columns})
+    return pd.DataFrame(columns)
+
+def _grouped_move(move_func, values, group_keys, window):
+    """Apply a bottleneck moving-window function within each contiguous group"""
+    bounds = np.flatnonzero(np.r_[True, group_keys[1:] != group_keys[:-1], True])
+    out = np.empty(len(values), dtype=np.float64)
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        out[start:end] = move_func(values[start:end], window=window, min_count=1)
+    return out
 
 def create_comprehensive_retail_dataset():
     """Create comprehensive retail dataset using H2O's capabilities"""
@@ -109,109 +189,116 @@ def create_comprehensive_retail_dataset():
     print("🚀 Building comprehensive retail dataset with H2O...")
     
     # Step 1: Create product master data
-    products_frame = create_retail_base_frame()
+    products_list = create_retail_base_frame()
     
     # Step 2: Create time series features
-    time_frame = create_time_series_features()
-    
-    # Step 3: Create sales patterns
-    sales_frame = create_sales_patterns_frame()
+    time_list = create_time_series_features()
     
-    # Step 4: Create product-date combinations
+    # Step 3: Create product-date combinations
     print("🔗 Creating product-date combinations...")
     
-    # Create a cross-join equivalent for products and dates
-    products_list = products_frame.as_data_frame()
-    time_list = time_frame.as_data_frame()
-    
     # Create Cartesian product (all combinations)
-    retail_data = []
-    for _, product in products_list.iterrows():
-        for _, time_row in time_list.iterrows():
-            # Calculate realistic demand based on multiple factors
-            base_demand = np.random.uniform(5, 50)
-            
-            # Seasonal effects
-            seasonal_multiplier = 1 + 0.3 * np.sin(2 * np.pi * time_row['day_of_year'] / 365)
-            
-            # Weekend effects (varies by category)
-            weekend_effect = 1.3 if time_row['is_weekend'] and np.random.random() < 0.5 else 1.0
-            
-            # Holiday season boost
-            holiday_effect = 2.0 if time_row['is_holiday_season'] else 1.0
-            
-            # Random promotions
-            on_promotion = np.random.random() < 0.1  # 10% chance
-            promotion_effect = 1.5 if on_promotion else 1.0
-            
-            # Calculate final demand with noise
-            final_demand = max(0, int(
-                base_demand * seasonal_multiplier * weekend_effect * 
-                holiday_effect * promotion_effect * np.random.uniform(0.7, 1.3)
-            ))
-            
-            # Dynamic pricing
-            price = product['base_price'] * (0.8 if on_promotion else 1.0) * np.random.uniform(0.95, 1.05)
-            
-            retail_data.append({
-                'date': time_row['date'],
-                'product_id': f"PROD_{int(product['product_id']):03d}",
-                'category': product['category'],
-                'supplier': product['supplier'],
-                'quantity_sold': final_demand,
-                'price': round(price, 2),
-                'revenue': round(final_demand * price, 2),
-                'stock_level': np.random.randint(20, 300),
-                'base_price': product['base_price'],
-                'weight': product['weight'],
-                'year': time_row['year'],
-                'month': time_row['month'],
-                'day_of_week': time_row['day_of_week'],
-                'quarter': time_row['quarter'],
-                'is_weekend': time_row['is_weekend'],
-                'is_holiday_season': time_row['is_holiday_season'],
-                'on_promotion': on_promotion,
-                'day_of_year': time_row['day_of_year']
-            })
-    
-    # Convert to H2O Frame
-    retail_df = pd.DataFrame(retail_data)
-    print(f"📊 Created comprehensive dataset with {len(retail_df)} records")
+    cross = cross_join(products_list, time_list)
+    n_products, n_days, n_rows = len(products_list), len(time_list), len(cross)
+    
+    # Per-day and per-product inputs; the demand kernel broadcasts these over the grid
+    day_of_year = time_list['day_of_year'].to_numpy(dtype=np.int64, copy=True)
+    is_weekend = time_list['is_weekend'].to_numpy() == 1
+    is_holiday_season = time_list['is_holiday_season'].to_numpy() == 1
+    base_price = products_list['base_price'].to_numpy(dtype=np.float64, copy=True)
+    
+    # Draw all randomness up front from one PCG64 generator so both kernels see identical inputs
+    rng = np.random.default_rng(42)
+    base_demand = rng.uniform(5, 50, n_rows)
+    weekend_roll = rng.random(n_rows)
+    promo_roll = rng.random(n_rows)
+    noise = rng.uniform(0.7, 1.3, n_rows)
+    price_jitter = rng.uniform(0.95, 1.05, n_rows)
+    stock = rng.integers(20, 300, n_rows)
+    
+    final_demand, price, on_promotion = generate_demand(
+        base_price, day_of_year, is_weekend, is_holiday_season,
+        base_demand, weekend_roll, promo_roll, noise, price_jitter
+    )
     
-    # Convert to H2O Frame
-    h2o_retail_frame = H2OFrame(retail_df)
+    # Assemble from columnar arrays in their final dtypes; product IDs are formatted
+    # once per product and stored as categorical codes
+    product_ids = pd.Categorical.from_codes(
+        np.repeat(np.arange(n_products, dtype=np.int16), n_days),
+        categories=[f"PROD_{int(pid):03d}" for pid in products_list['product_id']]
+    )
+    retail_df = pd.DataFrame({
+        'date': cross['date'],
+        'product_id': product_ids,
+        'category': cross['category'],
+        'supplier': cross['supplier'],
+        'quantity_sold': final_demand.astype(np.int32),
+        'price': np.round(price, 2),
+        'revenue': np.round(final_demand * price, 2),
+        'stock_level': stock.astype(np.int16),
+        'base_price': cross['base_price'],
+        'weight': cross['weight'],
+        'year': cross['year'].to_numpy(dtype=np.int16),
+        'month': cross['month'].to_numpy(dtype=np.int8),
+        'day_of_week': cross['day_of_week'].to_numpy(dtype=np.int8),
+        'quarter': cross['quarter'].to_numpy(dtype=np.int8),
+        'is_weekend': cross['is_weekend'].to_numpy(dtype=np.int8),
+        'is_holiday_season': cross['is_holiday_season'].to_numpy(dtype=np.int8),
+        'on_promotion': on_promotion.view(np.int8),
+        'day_of_year': cross['day_of_year'].to_numpy(dtype=np.int16)
+    })
+    print(f"📊 Created comprehensive dataset with {len(retail_df)} records")
     
-    # Add calculated features using H2O operations
-    print("🔧 Adding advanced features with H2O...")
+    # Add calculated features
+    print("🔧 Adding advanced features...")
     
     # Sort by product and date for time series features
-    h2o_retail_frame = h2o_retail_frame.sort(['product_id', 'date'])
-    
-    # Add rolling averages (H2O way)
-    # Note: H2O doesn't have direct rolling window functions, so we'll add these in pandas then convert
+    # Note: H2O doesn't have direct rolling window functions, so these are added in pandas
+    # and the finished frame is uploaded once at the end
     retail_df['date'] = pd.to_datetime(retail_df['date'])
     retail_df = retail_df.sort_values(['product_id', 'date'])
     
     # Calculate rolling features
-    retail_df['quantity_sold_7d_avg'] = retail_df.groupby('product_id')['quantity_sold'].transform(
-        lambda x: x.rolling(window=7, min_periods=1).mean()
-    )
-    retail_df['quantity_sold_30d_avg'] = retail_df.groupby('product_id')['quantity_sold'].transform(
-        lambda x: x.rolling(window=30, min_periods=1).mean()
-    )
-    retail_df['revenue_7d_sum'] = retail_df.groupby('product_id')['revenue'].transform(
-        lambda x: x.rolling(window=7, min_periods=1).sum()
-    )
+    if BOTTLENECK_AVAILABLE:
+        # Rows are contiguous per product after the sort, so scan each block directly
+        product_ids = retail_df['product_id'].cat.codes.to_numpy()
+        quantity_sold = retail_df['quantity_sold'].to_numpy()
+        retail_df['quantity_sold_7d_avg'] = _grouped_move(bn.move_mean, quantity_sold, product_ids, 7)
+        retail_df['quantity_sold_30d_avg'] = _grouped_move(bn.move_mean, quantity_sold, product_ids, 30)
+        retail_df['revenue_7d_sum'] = _grouped_move(
+            bn.move_sum, retail_df['revenue'].to_numpy(), product_ids, 7
+        )
+    else:
+        # One grouped window per size shared across columns; JIT-compiled when numba is present
+        engine = {'engine': 'numba', 'engine_kwargs': NUMBA_ENGINE_KWARGS} if NUMBA_AVAILABLE else {}
+        by_product = retail_df.groupby('product_id', sort=False, observed=True)
+        window_7d = by_product[['quantity_sold', 'revenue']].rolling(window=7, min_periods=1)
+        window_30d = by_product['quantity_sold'].rolling(window=30, min_periods=1)
+        retail_df['quantity_sold_7d_avg'] = window_7d['quantity_sold'].mean(**engine).reset_index(level=0, drop=True)
+        retail_df['quantity_sold_30d_avg'] = window_30d.mean(**engine).reset_index(level=0, drop=True)
+        retail_df['revenue_7d_sum'] = window_7d['revenue'].sum(**engine).reset_index(level=0, drop=True)
+    
+    # Inventory flags are written straight into int8 buffers (viewed as bool) by the compares
+    stock_level = retail_df['stock_level'].to_numpy()
     
     # Stockout risk indicator
-    retail_df['stockout_risk'] = (retail_df['stock_level'] < retail_df['quantity_sold_7d_avg'] * 3).astype(int)
+    stockout_risk = np.empty(n_rows, dtype=np.int8)
+    np.less(stock_level, retail_df['quantity_sold_7d_avg'].to_numpy() * 3, out=stockout_risk.view(np.bool_))
+    retail_df['stockout_risk'] = stockout_risk
+    
+    # Reorder point calculation (1 week buffer)
+    reorder_point = np.empty(n_rows, dtype=np.float32)
+    np.multiply(retail_df['quantity_sold_30d_avg'].to_numpy(), 7, out=reorder_point, dtype=np.float32)
+    needs_reorder = np.empty(n_rows, dtype=np.int8)
+    np.less(stock_level, reorder_point, out=needs_reorder.view(np.bool_))
+    retail_df['reorder_point'] = reorder_point
+    retail_df['needs_reorder'] = needs_reorder
     
-    # Reorder point calculation
-    retail_df['reorder_point'] = retail_df['quantity_sold_30d_avg'] * 7  # 1 week buffer
-    retail_df['needs_reorder'] = (retail_df['stock_level'] < retail_df['reorder_point']).astype(int)
+    # Downcast to the narrowest dtypes to shrink the CSV and H2O upload payloads
+    retail_df = retail_df.astype(COMPACT_DTYPES)
     
-    # Convert final dataset to H2O Frame
-    final_h2o_frame = H2OFrame(retail_df)
+    # Convert final dataset to H2O Frame (Parquet, so the cluster parses typed columns in parallel)
+    final_h2o_frame = upload_parquet([retail_df])
     
     print(f"✅ Final dataset shape: {final_h2o_frame.shape}")
     print("📝 Dataset columns:", final_h2o_frame.columns)
@@ -222,19 +309,16 @@ def save_datasets(h2o_frame, pandas_df):
     """Save datasets in multiple formats"""
     print("💾 Saving datasets...")
     
-    import os
     os.makedirs('../shared/data', exist_ok=True)
     
     # Save pandas version for compatibility
-    pandas_df.to_csv('../shared/data/retail_full.csv', index=False)
+    write_csv(pandas_df, '../shared/data/retail_full.csv')
     
     # Split into train/test
-    split_date = pandas_df['date'].quantile(0.8)
-    train_df = pandas_df[pandas_df['date'] <= split_date]
-    test_df = pandas_df[pandas_df['date'] > split_date]
+    train_df, test_df = time_split(pandas_df)
     
-    train_df.to_csv('../shared/data/retail_train.csv', index=False)
-    test_df.to_csv('../shared/data/retail_test.csv', index=False)
+    write_csv(train_df, '../shared/data/retail_train.csv')
+    write_csv(test_df, '../shared/data/retail_test.csv')
     
     # Save H2O version
     h2o.export_file(h2o_frame, '../shared/data/retail_h2o.csv', force=True)
@@ -6,26 +6,224 @@ Real-time demand forecasting and inventory optimization
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import functools
+import hashlib
+import importlib.util
 import os
+import subprocess
 import sys
+import tempfile
+import time
 from datetime import datetime, timedelta
 import warnings
-warnings.filterwarnings('ignore')
 
-# H2O import with fallback for demo
-try:
-    import h2o
-    H2O_AVAILABLE = True
-except ImportError:
-    H2O_AVAILABLE = False
+# H2O availability check with fallback for demo; h2o itself is imported on first use
+H2O_AVAILABLE = importlib.util.find_spec('h2o') is not None
+if not H2O_AVAILABLE:
     st.sidebar.warning("⚠️ H2O not installed - running in demo mode")
 
+@functools.lru_cache(maxsize=None)
+def _h2o():
+    """Import the h2o client on first use (only needed for cluster/model actions)"""
+    import h2o
+    return h2o
+
+@functools.lru_cache(maxsize=None)
+def _px():
+    """Import plotly.express on first use"""
+    import plotly.express as px
+    return px
+
+@functools.lru_cache(maxsize=None)
+def _pio():
+    """Import plotly.io on first use"""
+    import plotly.io as pio
+    return pio
+
 # Add path for shared utilities
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 
+# Background retraining: output goes to a per-run log file (no pipe to drain) polled on rerun
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_POLL_SECS = 2
+TRAINING_POLL_SLICE_SECS = 0.25
+
+# Explicit dtypes for the retail CSVs the app generates itself, so the parser skips type inference
+RETAIL_CSV_DTYPES = {
+    'product_id': 'string[pyarrow]',
+    'category': 'string[pyarrow]',
+    'day_of_week': 'int8',
+    'month': 'int8',
+    'is_weekend': 'int8',
+    'is_holiday_season': 'int8',
+    'on_promotion': 'int8',
+    'stock_level': 'int32',
+    'price': 'float32',
+    'quantity_sold_7d_avg': 'float32',
+    'quantity_sold_30d_avg': 'float32'
+}
+
+def read_retail_csv(source):
+    """Read a generated retail CSV (path or file-like) with Arrow's multi-threaded parser"""
+    return pd.read_csv(source, engine='pyarrow', dtype=RETAIL_CSV_DTYPES)
+
+def read_uploaded_csv(source):
+    """Read a user CSV with Arrow's parser, keeping inferred nullable types (no downcasting)"""
+    return pd.read_csv(source, engine='pyarrow', dtype_backend='pyarrow')
+
+def frame_hash(df):
+    """Content hash of a DataFrame (column names and ordered rows), used as a cache key for derived views"""
+    digest = hashlib.md5(pd.util.hash_pandas_object(df, index=False).to_numpy())
+    digest.update('\x1f'.join(map(str, df.columns)).encode())
+    return digest.hexdigest()
+
+@st.cache_data(ttl=3600)
+def _load_sample_data(data_path, mtime):
+    """Sample data and its frame_hash, computed once per file version rather than on every rerun"""
+    df = _read_sample_data(data_path, mtime)
+    return df, frame_hash(df)
+
+def _read_sample_data(data_path, mtime):
+    """Read the sample CSV, or generate minimal sample data when it doesn't exist"""
+    if mtime is not None:
+        return read_retail_csv(data_path)
+    
+    # Seeded so the cached fallback is stable across reruns
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'product_id': [f'PROD_{i:03d}' for i in range(1, 11)],
+        'category': ['Electronics', 'Clothing', 'Food', 'Books', 'Home'] * 2,
+        'price': rng.uniform(10, 200, 10),
+        'day_of_week': rng.integers(0, 7, 10),
+        'month': rng.integers(1, 13, 10),
+        'is_weekend': rng.integers(0, 2, 10),
+        'is_holiday_season': rng.integers(0, 2, 10),
+        'on_promotion': rng.integers(0, 2, 10),
+        'quantity_sold_7d_avg': rng.uniform(5, 50, 10),
+        'quantity_sold_30d_avg': rng.uniform(10, 40, 10),
+        'stock_level': rng.integers(20, 300, 10)
+    })
+
+@st.cache_data(ttl=3600)
+def _trend_data():
+    """Sample daily demand series for the trend chart"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
+    return pd.DataFrame({
+        'date': dates,
+        'demand': rng.normal(30, 8, len(dates)) + 5 * np.sin(2 * np.pi * np.arange(len(dates)) / 365)
+    })
+
+@st.cache_data(ttl=3600)
+def _dash_metrics(df_hash, _df):
+    """Overview metrics; keyed on df_hash (the leading underscore skips hashing _df again)"""
+    stock_level = _df['stock_level'].to_numpy()
+    return (
+        _df['product_id'].nunique(),
+        float(stock_level.mean()),
+        int(np.less(stock_level, 50).sum()),
+        float(_df['on_promotion'].mean() * 100)
+    )
+
+def _mock_demand(avg_demand_7d, on_promotion, is_holiday, is_weekend, noise):
+    """Mock demand prediction used when no trained model is loaded"""
+    base_demand = avg_demand_7d * (1.5 if on_promotion else 1.0)
+    seasonal_factor = 1.2 if is_holiday else 1.0
+    weekend_factor = 1.1 if is_weekend else 1.0
+    return base_demand * seasonal_factor * weekend_factor * noise
+
+@st.cache_resource
+def _mock_demand_kernel():
+    """Compile _mock_demand once per server process (the script itself re-runs every interaction)"""
+    # numba is imported here, on first use, and is optional (missing or broken installs fall back)
+    try:
+        from numba import njit
+    except ImportError:
+        return _mock_demand
+    # Explicit signature compiles here rather than on the first click; cache=True reuses it across launches
+    return njit('float64(float64, boolean, boolean, boolean, float64)', cache=True, fastmath=True)(_mock_demand)
+
+@st.cache_data(ttl=3600)
+def _arrow_view(df_hash, _df):
+    """Arrow-backed copy of a frame so st.dataframe serializes it without conversion"""
+    return _df.convert_dtypes(dtype_backend='pyarrow')
+
+ABC_LABELS = ['C', 'B', 'A']
+
+# Static selectbox options for the manual prediction form
+WEEKDAYS = tuple(range(7))
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTHS = tuple(range(1, 13))
+
+@st.cache_data(ttl=3600)
+def _product_ids(df_hash, _df):
+    """Distinct product ids in first-seen order; keyed on df_hash like _dash_metrics"""
+    return tuple(pd.unique(_df['product_id']))
+
+def _abc_distribution(sample_data):
+    """Count products per ABC revenue tercile (C = lowest revenue third); cached via _chart_json"""
+    revenue = (sample_data['price'] * sample_data['quantity_sold_7d_avg']).to_numpy()
+    n = len(revenue)
+    k1, k2 = n // 3, 2 * n // 3
+    
+    # O(n) selection at the two cut points instead of sorting for qcut
+    order = np.argpartition(revenue, [k1, k2]) if n else np.empty(0, dtype=np.intp)
+    abc_class = np.empty(n, dtype=np.int8)
+    abc_class[order[:k1]] = 0
+    abc_class[order[k1:k2]] = 1
+    abc_class[order[k2:]] = 2
+    return np.bincount(abc_class, minlength=3)
+
+# Charts derived from sample_data, built once per frame hash
+SAMPLE_CHARTS = {
+    'stock_by_category': lambda px, df: px.box(df, x='category', y='stock_level',
+                                               title="Stock Levels by Category"),
+    'demand_vs_stock': lambda px, df: px.scatter(df, x='quantity_sold_7d_avg', y='stock_level',
+                                                 color='category', size='price',
+                                                 title="Demand vs Stock Levels"),
+    'abc_distribution': lambda px, df: px.bar(x=ABC_LABELS, y=_abc_distribution(df),
+                                              labels={'x': 'abc_class', 'y': 'count'},
+                                              title="ABC Classification Distribution")
+}
+
+@st.cache_data(ttl=3600)
+def _chart_json(df_hash, chart, _df):
+    """Serialized plotly figure for a SAMPLE_CHARTS entry; keyed on df_hash like _dash_metrics"""
+    return SAMPLE_CHARTS[chart](_px(), _df).to_json()
+
+@st.cache_data(ttl=3600)
+def _trend_chart_json():
+    """Serialized plotly figure for the daily demand trend"""
+    return _px().line(_trend_data(), x='date', y='demand', title="Daily Demand Trend").to_json()
+
+def _figure(fig_json):
+    """Rebuild a figure from cached JSON, skipping plotly's figure construction on reruns"""
+    return _pio().from_json(fig_json)
+
+@st.cache_resource
+def _connect_h2o(h2o_url):
+    """Connect to the H2O cluster once per server process"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if 'localhost' in h2o_url:
+            _h2o().init(ip="localhost", port=54321, max_mem_size="4g", strict_version_check=False)
+        else:
+            _h2o().init(url=h2o_url, strict_version_check=False)
+    return True
+
+@st.cache_resource
+def _get_mojo(mojo_path, mtime):
+    """Import a MOJO once per file version (mtime is part of the key) and share the handle across reruns"""
+    return _h2o().import_mojo(mojo_path)
+
+def _cluster_running():
+    """Whether the client is connected to a live H2O cluster"""
+    try:
+        cluster = _h2o().cluster()
+        return cluster is not None and cluster.is_running()
+    except Exception:
+        return False
+
 class InventoryDashboard:
     def __init__(self):
         self.h2o_initialized = False
@@ -38,14 +236,17 @@ class InventoryDashboard:
             st.error("❌ H2O not available - running in demo mode")
             return False
             
+        if not _cluster_running():
+            # Cluster gone (e.g. container restart): drop the cached connection and cluster-side model handles
+            _connect_h2o.clear()
+            _get_mojo.clear()
+            self.h2o_initialized = False
+            self.model = None
+        
         if not self.h2o_initialized:
             try:
                 # Try to connect to existing H2O cluster
-                h2o_url = os.getenv('H2O_URL', 'http://localhost:54321')
-                if 'localhost' in h2o_url:
-                    h2o.init(ip="localhost", port=54321, max_mem_size="4g", strict_version_check=False)
-                else:
-                    h2o.init(url=h2o_url, strict_version_check=False)
+                _connect_h2o(os.getenv('H2O_URL', 'http://localhost:54321'))
                 
                 self.h2o_initialized = True
                 st.success("✅ Connected to H2O cluster")
@@ -66,12 +267,13 @@ class InventoryDashboard:
         
         if os.path.exists(model_dir):
             try:
-                # Find MOJO file
+                # Find the most recently written MOJO file (older runs stay in the directory)
                 mojo_files = [f for f in os.listdir(model_dir) if f.endswith('.zip')]
                 if mojo_files:
-                    mojo_path = os.path.join(model_dir, mojo_files[0])
-                    self.model = h2o.import_mojo(mojo_path)
-                    st.success(f"✅ Model loaded: {mojo_files[0]}")
+                    mojo_file = max(mojo_files, key=lambda f: os.path.getmtime(os.path.join(model_dir, f)))
+                    mojo_path = os.path.join(model_dir, mojo_file)
+                    self.model = _get_mojo(mojo_path, os.path.getmtime(mojo_path))
+                    st.success(f"✅ Model loaded: {mojo_file}")
                     return True
                 else:
                     st.warning("⚠️ No MOJO file found in model directory")
@@ -82,25 +284,55 @@ class InventoryDashboard:
         return False
     
     def load_sample_data(self):
-        """Load sample data for demo"""
+        """Load sample data for demo; returns the frame and its content hash"""
         data_path = '../shared/data/retail_test.csv'
-        if os.path.exists(data_path):
-            return pd.read_csv(data_path)
-        else:
-            # Generate minimal sample data
-            return pd.DataFrame({
-                'product_id': [f'PROD_{i:03d}' for i in range(1, 11)],
-                'category': ['Electronics', 'Clothing', 'Food', 'Books', 'Home'] * 2,
-                'price': np.random.uniform(10, 200, 10),
-                'day_of_week': np.random.randint(0, 7, 10),
-                'month': np.random.randint(1, 13, 10),
-                'is_weekend': np.random.choice([0, 1], 10),
-                'is_holiday_season': np.random.choice([0, 1], 10),
-                'on_promotion': np.random.choice([0, 1], 10),
-                'quantity_sold_7d_avg': np.random.uniform(5, 50, 10),
-                'quantity_sold_30d_avg': np.random.uniform(10, 40, 10),
-                'stock_level': np.random.randint(20, 300, 10)
-            })
+        # The file's mtime is part of the cache key, so a regenerated CSV is re-read
+        mtime = os.path.getmtime(data_path) if os.path.exists(data_path) else None
+        return _load_sample_data(data_path, mtime)
+
+def _start_training():
+    """Launch the AutoML pipeline as a background process; returns it with its own log file path"""
+    # One log per run, so concurrent sessions don't truncate or show each other's output
+    log_fd, log_path = tempfile.mkstemp(prefix='inventory_training_', suffix='.log')
+    with os.fdopen(log_fd, 'w') as log:
+        proc = subprocess.Popen(
+            [sys.executable, 'h2o_automl_pipeline.py'],
+            cwd=APP_DIR, stdout=log, stderr=subprocess.STDOUT
+        )
+    return proc, log_path
+
+def _read_log_tail(log_path, max_chars=2000):
+    """Last max_chars of a log, reading only the end of the file (AutoML info logs grow large)"""
+    with open(log_path, 'rb') as log:
+        # 4 bytes per char covers any UTF-8 text; a split leading character is replaced
+        log.seek(max(os.path.getsize(log_path) - 4 * max_chars, 0))
+        return log.read().decode('utf-8', errors='replace')[-max_chars:]
+
+def _show_training_status(dashboard):
+    """Report on the background training run; returns True while it is still running"""
+    train_proc = st.session_state.get('train_proc')
+    if train_proc is None:
+        return False
+    
+    log_path = st.session_state['train_log']
+    log_tail = _read_log_tail(log_path)
+    
+    returncode = train_proc.poll()
+    if returncode is None:
+        st.sidebar.info("⏳ Training new model...")
+        st.sidebar.code(log_tail)
+        return True
+    
+    del st.session_state['train_proc']
+    del st.session_state['train_log']
+    os.remove(log_path)
+    if returncode == 0:
+        st.sidebar.success("✅ Model retrained successfully!")
+        dashboard.load_model()
+    else:
+        st.sidebar.error(f"❌ Training failed (exit code {returncode})")
+        st.sidebar.code(log_tail)
+    return False
 
 def main():
     st.set_page_config(
@@ -113,7 +345,10 @@ def main():
     st.title("🏪 Inventory Intelligence Dashboard")
     st.subtitle("H2O AutoML-Powered Demand Forecasting & Inventory Optimization")
     
-    dashboard = InventoryDashboard()
+    # Keep the dashboard (connection state, loaded model) across reruns
+    if 'dashboard' not in st.session_state:
+        st.session_state['dashboard'] = InventoryDashboard()
+    dashboard = st.session_state['dashboard']
     
     # Sidebar for configuration
     st.sidebar.header("⚙️ Configuration")
@@ -130,18 +365,17 @@ def main():
             dashboard.load_model()
     
     if st.sidebar.button("🔄 Retrain Model"):
-        if dashboard.initialize_h2o():
-            with st.spinner("Training new model..."):
-                # Run training pipeline
-                os.system("cd /Users/rammaree/h2o_ml_usecases/h2o-prototypes/inventory && python h2o_automl_pipeline.py")
-                st.success("✅ Model retrained successfully!")
-                dashboard.load_model()
+        if dashboard.initialize_h2o() and 'train_proc' not in st.session_state:
+            # Run training pipeline in the background so the UI stays responsive
+            st.session_state['train_proc'], st.session_state['train_log'] = _start_training()
+    
+    training = _show_training_status(dashboard)
     
     # Main dashboard tabs
     tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard", "🔮 Predictions", "📈 Analytics", "📋 Data"])
     
     # Load sample data
-    sample_data = dashboard.load_sample_data()
+    sample_data, sample_hash = dashboard.load_sample_data()
     
     with tab1:
         st.header("📊 Inventory Overview")
@@ -149,20 +383,18 @@ def main():
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
+        total_products, avg_stock, low_stock_count, promo_rate = _dash_metrics(sample_hash, sample_data)
+        
         with col1:
-            total_products = len(sample_data['product_id'].unique())
             st.metric("Total Products", total_products)
         
         with col2:
-            avg_stock = sample_data['stock_level'].mean()
             st.metric("Avg Stock Level", f"{avg_stock:.0f}")
         
         with col3:
-            low_stock_count = (sample_data['stock_level'] < 50).sum()
             st.metric("Low Stock Items", low_stock_count, delta=-5)
         
         with col4:
-            promo_rate = sample_data['on_promotion'].mean() * 100
             st.metric("Promotion Rate", f"{promo_rate:.1f}%")
         
         # Visualizations
@@ -170,15 +402,12 @@ def main():
         
         with col1:
             # Stock levels by category
-            fig = px.box(sample_data, x='category', y='stock_level', 
-                        title="Stock Levels by Category")
+            fig = _figure(_chart_json(sample_hash, 'stock_by_category', sample_data))
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             # Demand vs Stock scatter
-            fig = px.scatter(sample_data, x='quantity_sold_7d_avg', y='stock_level',
-                           color='category', size='price',
-                           title="Demand vs Stock Levels")
+            fig = _figure(_chart_json(sample_hash, 'demand_vs_stock', sample_data))
             st.plotly_chart(fig, use_container_width=True)
     
     with tab2:
@@ -193,12 +422,12 @@ def main():
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                product_id = st.selectbox("Product", sample_data['product_id'].unique())
+                product_id = st.selectbox("Product", _product_ids(sample_hash, sample_data))
                 price = st.number_input("Price ($)", min_value=0.0, value=50.0)
-                day_of_week = st.selectbox("Day of Week", list(range(7)), format_func=lambda x: ['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][x])
+                day_of_week = st.selectbox("Day of Week", WEEKDAYS, format_func=WEEKDAY_NAMES.__getitem__)
             
             with col2:
-                month = st.selectbox("Month", list(range(1, 13)))
+                month = st.selectbox("Month", MONTHS)
                 is_weekend = st.checkbox("Weekend")
                 is_holiday = st.checkbox("Holiday Season")
             
@@ -208,13 +437,15 @@ def main():
                 avg_demand_30d = st.number_input("30-day Avg Demand", min_value=0.0, value=30.0)
                 stock_level = st.number_input("Current Stock", min_value=0, value=100)
             
+            # Resolve (and compile) the kernel while the form renders, not on the first click
+            mock_demand = _mock_demand_kernel()
+            
             if st.button("🎯 Predict Demand"):
                 # Mock prediction for demo
-                base_demand = avg_demand_7d * (1.5 if on_promotion else 1.0)
-                seasonal_factor = 1.2 if is_holiday else 1.0
-                weekend_factor = 1.1 if is_weekend else 1.0
-                
-                predicted_demand = base_demand * seasonal_factor * weekend_factor * np.random.uniform(0.8, 1.2)
+                noise = np.random.default_rng().uniform(0.8, 1.2)
+                predicted_demand = mock_demand(
+                    float(avg_demand_7d), bool(on_promotion), bool(is_holiday), bool(is_weekend), noise
+                )
                 
                 st.success(f"🎯 Predicted Demand: **{predicted_demand:.1f} units**")
                 
@@ -237,29 +468,15 @@ def main():
         # Trend analysis
         st.subheader("📊 Demand Trends")
         
-        # Generate sample time series data
-        dates = pd.date_range(start='2023-01-01', end='2023-12-31', freq='D')
-        trend_data = pd.DataFrame({
-            'date': dates,
-            'demand': np.random.normal(30, 8, len(dates)) + 5 * np.sin(2 * np.pi * np.arange(len(dates)) / 365)
-        })
-        
-        fig = px.line(trend_data, x='date', y='demand', title="Daily Demand Trend")
+        # Sample time series data
+        fig = _figure(_trend_chart_json())
         st.plotly_chart(fig, use_container_width=True)
         
         # ABC Analysis
         st.subheader("🏷️ ABC Analysis")
         
         # Mock ABC data
-        abc_data = pd.DataFrame({
-            'product_id': sample_data['product_id'],
-            'revenue': sample_data['price'] * sample_data['quantity_sold_7d_avg'],
-            'category': sample_data['category']
-        })
-        abc_data['abc_class'] = pd.qcut(abc_data['revenue'], q=3, labels=['C', 'B', 'A'])
-        
-        fig = px.bar(abc_data.groupby('abc_class').size().reset_index(name='count'), 
-                    x='abc_class', y='count', title="ABC Classification Distribution")
+        fig = _figure(_chart_json(sample_hash, 'abc_distribution', sample_data))
         st.plotly_chart(fig, use_container_width=True)
         
         # Optimization recommendations
@@ -284,13 +501,17 @@ def main():
         uploaded_file = st.file_uploader("Choose CSV file", type="csv")
         
         if uploaded_file is not None:
-            new_data = pd.read_csv(uploaded_file)
-            st.success(f"✅ Loaded {len(new_data)} records")
-            st.dataframe(new_data.head())
+            try:
+                new_data = read_uploaded_csv(uploaded_file)
+                st.success(f"✅ Loaded {len(new_data)} records")
+                st.dataframe(new_data.head())
+            except Exception as e:
+                st.error(f"❌ Could not read CSV: {e}")
         
         # Current data view
         st.subheader("📊 Sample Data")
-        st.dataframe(sample_data)
+        # Arrow-backed view in a fixed-height, virtually scrolled grid
+        st.dataframe(_arrow_view(sample_hash, sample_data), use_container_width=True, height=400)
         
         # Data quality check
         st.subheader("🔍 Data Quality")
@@ -309,6 +530,15 @@ def main():
     # Footer
     st.markdown("---")
     st.markdown("🏪 **Inventory Intelligence** | Powered by H2O AutoML | Built with Streamlit")
+    
+    # Poll the background training run in short slices; Streamlit only handles a pending
+    # user rerun at the next st.* call, so touch a placeholder after each slice
+    if training:
+        poll_slot = st.empty()
+        for _ in range(int(TRAINING_POLL_SECS / TRAINING_POLL_SLICE_SECS)):
+            time.sleep(TRAINING_POLL_SLICE_SECS)
+            poll_slot.empty()
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -35,29 +35,28 @@ try:
     products = [f'PROD_{i:03d}' for i in range(1, 6)]
     categories = ['Electronics', 'Clothing', 'Food']
     
-    data = []
-    for product in products:
-        for date in dates:
-            base_demand = np.random.uniform(5, 50)
-            demand = max(1, int(base_demand * np.random.uniform(0.8, 1.2)))
-            
-            data.append({
-                'date': date,
-                'product_id': product,
-                'category': np.random.choice(categories),
-                'quantity_sold': demand,
-                'price': round(np.random.uniform(10, 200), 2),
-                'stock_level': np.random.randint(20, 300),
-                'day_of_week': date.weekday(),
-                'month': date.month,
-                'is_weekend': int(date.weekday() >= 5),
-                'is_holiday_season': int(date.month in [11, 12]),
-                'on_promotion': int(np.random.random() < 0.1),
-                'quantity_sold_7d_avg': round(demand * 0.95, 2),
-                'quantity_sold_30d_avg': round(demand * 1.05, 2)
-            })
+    # Build the product x date grid and draw each random column in one call
+    idx = pd.MultiIndex.from_product([products, dates], names=['product_id', 'date']).to_frame(index=False)
+    n = len(idx)
+    rng = np.random.default_rng(0)
+    base_demand = rng.uniform(5, 50, n)
+    demand = np.maximum(1, (base_demand * rng.uniform(0.8, 1.2, n)).astype(np.int32))
+    day_of_week = idx['date'].dt.dayofweek
+    month = idx['date'].dt.month
     
-    df = pd.DataFrame(data)
+    df = idx.assign(
+        category=rng.choice(categories, n),
+        quantity_sold=demand,
+        price=np.round(rng.uniform(10, 200, n), 2),
+        stock_level=rng.integers(20, 300, n),
+        day_of_week=day_of_week,
+        month=month,
+        is_weekend=(day_of_week >= 5).astype(int),
+        is_holiday_season=(month >= 11).astype(int),
+        on_promotion=(rng.random(n) < 0.1).astype(int),
+        quantity_sold_7d_avg=np.round(demand * 0.95, 2),
+        quantity_sold_30d_avg=np.round(demand * 1.05, 2)
+    )
     print(f"✅ Generated test data: {len(df)} records")
     
     # Test plotly chart creation